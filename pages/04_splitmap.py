@@ -18,11 +18,22 @@ def create_split_map():
 
     return split_control
 
+# 兩側圖層都是 ipyleaflet 的 widget 狀態，前端重新掛載時會依模型重建畫面；
+# 存在以 session 為範圍的 solara.reactive，切換頁面再回來時不必重建兩張地圖
+split_map_instance = solara.reactive(None)
+
+def get_split_map():
+    split_control = split_map_instance.peek()
+    if split_control is None:
+        split_control = create_split_map()
+        split_map_instance.set(split_control)
+    return split_control
+
 @solara.component
 def Page():
     solara.Markdown("## 2D 捲簾比對 (Split Map)")
     
-    split_widget = solara.use_memo(create_split_map, dependencies=[])
+    split_widget = solara.use_memo(get_split_map, dependencies=[])
     
     with solara.Column(style={"width": "100%", "height": "700px"}):
         solara.display(split_widget)
\ No newline at end of file
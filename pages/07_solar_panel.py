@@ -1,11 +1,23 @@
 import solara
+import solara.lab
 import geopandas as gpd
 import pandas as pd
-import leafmap.foliumap as leafmap 
+import numpy as np
+import shapely
+import pyproj
+import orjson
+from maplibre import Layer, LayerType, MapOptions
+from maplibre.controls import FullscreenControl, NavigationControl, ScaleControl
+from maplibre.ipywidget import MapWidget
+from maplibre.sources import GeoJSONSource
 import warnings
-import tempfile # 新增: 用於處理暫存檔
+import asyncio
+import functools
+import threading
+import tempfile
 import os
 from pathlib import Path
+from dataclasses import dataclass
 from typing import Tuple, Optional
 
 # 忽略 geopandas 警告
@@ -15,20 +27,97 @@ warnings.simplefilter(action='ignore', category=FutureWarning)
 
 APP_ROOT = Path(__file__).parent.parent
 GEOJSON_FILENAME = "solar_panels_final_results.geojson"
-GEOJSON_PATH = Path("/code") / GEOJSON_FILENAME
+# 優先使用專案根目錄下的檔案 (本機執行)，否則退回 Docker 映像內的 /code；
+# 路徑與是否存在只在 import 時判斷一次
+GEOJSON_PATH = APP_ROOT / GEOJSON_FILENAME
+if not GEOJSON_PATH.exists():
+    GEOJSON_PATH = Path("/code") / GEOJSON_FILENAME
+GEOJSON_EXISTS = GEOJSON_PATH.exists()
 
 # 影像瓦片 (Esri World Imagery)
 TILE_URL = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
 
+# 以影像瓦片為底圖的 MapLibre Style (直接內嵌，建立地圖時不需再下載 style.json)
+MAP_STYLE = {
+    "version": 8,
+    "sources": {
+        "satellite": {
+            "type": "raster",
+            "tiles": [TILE_URL],
+            "tileSize": 256,
+            "attribution": "Esri World Imagery",
+        }
+    },
+    "layers": [{"id": "satellite", "type": "raster", "source": "satellite"}],
+}
+
+# GeoParquet 快取：第一次讀取 GeoJSON 後存成欄式二進位檔，之後冷啟動直接載入
+# (程式目錄唯讀時改存到暫存目錄)
+CACHE_DIR = GEOJSON_PATH.parent if os.access(GEOJSON_PATH.parent, os.W_OK) else Path(tempfile.gettempdir())
+# 快取欄位或型別改變時遞增版本，舊檔案不會被誤用
+CACHE_VERSION = 2
+CACHE_PATH = CACHE_DIR / f"{GEOJSON_PATH.stem}.v{CACHE_VERSION}.parquet"
+
+def read_geojson(path):
+    # pyogrio + Arrow 以欄式批次讀取；所有屬性欄位都要保留，下載的 GeoJSON 需完整輸出
+    data = gpd.read_file(path, engine="pyogrio", use_arrow=True)
+    if not data.empty:
+        # 確保 CRS 為 WGS84
+        if data.crs and data.crs.to_string() != "EPSG:4326":
+            data = reproject_to_wgs84(data)
+    return data
+
+def reproject_to_wgs84(data):
+    """以單次 pyproj 呼叫轉換所有頂點座標，取代逐幾何的 to_crs"""
+    transformer = pyproj.Transformer.from_crs(data.crs, "EPSG:4326", always_xy=True)
+
+    def transform_coords(coords):
+        # coords 為 (N, 2) 或 (N, 3)；Z 一併交給 pyproj，與 to_crs 相同保留高程
+        return np.column_stack(transformer.transform(*coords.T))
+
+    # shapely.transform 把全部座標攤平成一條陣列，只呼叫一次轉換函式；
+    # 2D 幾何若帶 include_z 會被補上 NaN 的 Z 而無法閉合，因此 3D 幾何分開轉換
+    geometry = np.asarray(data.geometry.values, dtype=object).copy()
+    has_z = shapely.has_z(geometry)
+    geometry[~has_z] = shapely.transform(geometry[~has_z], transform_coords)
+    if has_z.any():
+        geometry[has_z] = shapely.transform(geometry[has_z], transform_coords, include_z=True)
+    return data.set_geometry(gpd.GeoSeries(geometry, index=data.index, crs="EPSG:4326"))
+
+@functools.lru_cache(maxsize=1)
+def load_solar_data(path, mtime):
+    """讀取光電板資料；以 (路徑, 修改時間) 為快取鍵，GeoJSON 更新時自動重建快取"""
+    if CACHE_PATH.exists() and CACHE_PATH.stat().st_mtime >= mtime:
+        try:
+            return gpd.read_parquet(CACHE_PATH)
+        except Exception as e:
+            print(f"Error reading GeoParquet cache: {e}")
+
+    data = read_geojson(path)
+    try:
+        data.to_parquet(CACHE_PATH, compression="zstd", geometry_encoding="WKB")
+    except Exception as e:
+        print(f"Error writing GeoParquet cache: {e}")
+    return data
+
 def get_initial_data():
     data = None
-    if GEOJSON_PATH.exists():
+    if GEOJSON_EXISTS:
         try:
-            data = gpd.read_file(GEOJSON_PATH)
-            if not data.empty:
-                # 確保 CRS 為 WGS84
-                if data.crs and data.crs.to_string() != "EPSG:4326":
-                    data = data.to_crs("EPSG:4326")
+            loaded = load_solar_data(GEOJSON_PATH, GEOJSON_PATH.stat().st_mtime)
+            # 載入時就檢查欄位，篩選函式本身不再需要例外處理
+            if "area_m2" not in loaded.columns:
+                raise ValueError("GeoJSON 缺少 'area_m2' 欄位")
+            # 型別也只在這裡檢查一次：文字欄位若被靜默轉型，排序與篩選都會出錯
+            area_dtype = loaded["area_m2"].dtype
+            if not pd.api.types.is_numeric_dtype(area_dtype) or pd.api.types.is_bool_dtype(area_dtype):
+                raise ValueError(f"'area_m2' 欄位必須是數值，目前為 {area_dtype}")
+            # 空值或 NaN 的面積無法依門檻篩選 (NaN 排序在最後，會落入每個篩選後綴)，載入時直接排除
+            finite = np.isfinite(loaded["area_m2"].to_numpy(dtype="float64", na_value=np.nan))
+            if not finite.all():
+                print(f"Skipping {int((~finite).sum())} panels without a valid area_m2")
+                loaded = loaded[finite]
+            data = loaded
         except Exception as e:
             print(f"Error reading GeoJSON: {e}")
             
@@ -40,141 +129,396 @@ def get_initial_data():
         )
     return data
 
-initial_gdf = get_initial_data()
-all_solar_data = solara.reactive(initial_gdf)
+# 地圖顯示用的簡化容差：以 zoom 21 時一個像素對應的經緯度為準 (赤道上約 7 cm)，
+# 更低 zoom 的簡化由 MapLibre 的 GeoJSON source 在前端依 zoom 自行處理
+DISPLAY_MAX_ZOOM = 21
+SIMPLIFY_TOLERANCE = 360 / (256 * 2 ** DISPLAY_MAX_ZOOM)
+GRID_SIZE = 1e-7  # 座標對齊至約 1 cm，縮短 JSON 內的小數位數
+# 小於此面積的光電板只有數公尺寬，容差相對於邊長太大，簡化後形狀會明顯變形，直接保留原幾何
+MIN_SIMPLIFY_AREA_M2 = 10.0
 
-def calculate_filtered_data(min_area_value):
-    """計算篩選後的 GeoDataFrame"""
-    if all_solar_data.value.empty:
-        return gpd.GeoDataFrame()
-    
-    try:
-        filtered = all_solar_data.value[all_solar_data.value['area_m2'] >= min_area_value].copy()
-        return filtered
-    except Exception as e:
-        print(f"Filter error: {e}")
-        return all_solar_data.value
+def simplify_for_display(geometry, area):
+    """向量化簡化幾何 (GEOS C 迴圈)，去掉地圖上看不見的頂點；小光電板或簡化後為空則保留原幾何"""
+    simplified = shapely.simplify(
+        shapely.set_precision(geometry, grid_size=GRID_SIZE),
+        tolerance=SIMPLIFY_TOLERANCE,
+        preserve_topology=True,
+    )
+    keep = (area < MIN_SIMPLIFY_AREA_M2) | shapely.is_empty(simplified)
+    return np.where(keep, geometry, simplified)
 
-# --- 2. Leafmap 地圖元件 (修復權限與參數問題) ---
+def build_features(geometry, area):
+    """一次把每筆光電板轉成 GeoJSON Feature dict，存成 object 陣列以便依索引切片
+    (地圖只需要篩選用的 area_m2 與滑鼠提示文字，其餘屬性只放在下載檔)"""
+    # 幾何由 shapely 向量化輸出 JSON 字串，再以 orjson 逐筆解析
+    geoms_json = shapely.to_geojson(geometry)
+    features = np.empty(len(geometry), dtype=object)
+    features[:] = [
+        {
+            "type": "Feature",
+            "properties": {"area_m2": a, "area_label": f"{a:.2f} m²"},
+            # 缺幾何的光電板 (to_geojson 回傳 None) 與 to_json 相同輸出 null
+            "geometry": None if g is None else orjson.loads(g),
+        }
+        for g, a in zip(geoms_json, area.tolist())
+    ]
+    return features
 
-@solara.component
-def GeoAI_MapView(current_filtered_data):
-    
-    # 1. 初始化地圖
-    m = leafmap.Map(
-        location=[23.7, 120.9], 
-        zoom_start=7,
-        height="600px", 
-        control_scale=True
-    )
-    
-    # 2. 加入底圖
-    m.add_tile_layer(
-        url=TILE_URL, 
-        attribution="Esri World Imagery", 
-        name="Satellite Imagery"
+@dataclass(frozen=True, eq=False)
+class PanelArrays:
+    """依面積遞增排序的光電板欄式資料 (SoA)：每個欄位是一條連續的 NumPy 陣列"""
+    area: np.ndarray      # float32，只供篩選 (下載仍輸出 properties 內的 float64 原值)
+    geometry: np.ndarray  # shapely 幾何物件
+    bounds: np.ndarray    # (N, 4) float64：minx, miny, maxx, maxy
+    properties: np.ndarray  # 每筆光電板的完整屬性 dict (下載用)
+    features: np.ndarray  # 預先序列化的 GeoJSON Feature dict (地圖用，只含 area_m2)
+    tree: Optional[shapely.STRtree] = None  # 只在完整資料集上建立 (切片不帶空間索引)
+    suffix_bounds: Optional[np.ndarray] = None  # (N, 4)：第 i 筆之後所有光電板的總外框
+
+    @classmethod
+    def from_gdf(cls, gdf):
+        order = np.argsort(gdf["area_m2"].to_numpy(), kind="stable")
+        geometry = np.asarray(gdf.geometry.values, dtype=object)[order]
+        # 滑桿步距 10 m²，篩選用 float32 已足夠，記憶體與比較頻寬減半；
+        # float64 依序轉成 float32 仍保持遞增，可直接二分搜尋
+        area = gdf["area_m2"].to_numpy(dtype="float32")[order]
+        bounds = shapely.bounds(geometry)
+        properties = np.empty(len(gdf), dtype=object)
+        properties[:] = gdf.drop(columns=gdf.geometry.name).to_dict("records")
+        return cls(
+            area=area,
+            geometry=geometry,
+            # 一次向量化計算每個幾何的外框，之後求範圍只需 NumPy min/max
+            bounds=bounds,
+            properties=properties[order],
+            # 幾何不會變動，(簡化後的) Feature 只在載入時轉換一次，之後篩選只是切片
+            features=build_features(simplify_for_display(geometry, area), area),
+            # 載入時建立一次 R-tree，之後依視窗範圍查詢為 O(log N)
+            tree=shapely.STRtree(geometry),
+            # 篩選結果一定是排序後的後綴，由後往前累積 min/max，任一門檻的範圍皆為 O(1) 查表；
+            # fmin / fmax 略過空幾何或缺幾何的 NaN 外框
+            suffix_bounds=np.hstack([
+                np.fmin.accumulate(bounds[::-1, :2], axis=0)[::-1],
+                np.fmax.accumulate(bounds[::-1, 2:], axis=0)[::-1],
+            ]),
+        )
+
+    def __len__(self):
+        return len(self.area)
+
+    def __getitem__(self, index):
+        # 切片只產生 NumPy view，不複製任何資料
+        return PanelArrays(
+            area=self.area[index],
+            geometry=self.geometry[index],
+            bounds=self.bounds[index],
+            properties=self.properties[index],
+            features=self.features[index],
+        )
+
+    @property
+    def empty(self):
+        return len(self.area) == 0
+
+    def cut_index(self, min_area_value):
+        """面積 >= 門檻的第一筆位置 (二分搜尋)；門檻先轉成與欄位相同的 float32 再比較"""
+        return int(np.searchsorted(self.area, np.float32(min_area_value), side="left"))
+
+    @property
+    def max_area(self):
+        # 已依面積排序，最大值就是最後一筆，不必掃描整個陣列
+        return float(self.area[-1])
+
+    def filtered_bounds(self, min_area_value):
+        """面積 >= 門檻的光電板總外框 (查表)；沒有符合 (或都沒有幾何) 的光電板時回傳 None"""
+        start = self.cut_index(min_area_value)
+        if start >= len(self) or np.isnan(self.suffix_bounds[start]).any():
+            return None
+        return tuple(self.suffix_bounds[start].tolist())
+
+    def filter_viewport(self, bbox, min_area_value=None):
+        """回傳與 bbox (minx, miny, maxx, maxy) 相交、且面積 >= 門檻的位置索引 (遞增)"""
+        idx = np.sort(self.tree.query(shapely.box(*bbox), predicate="intersects"))
+        if min_area_value is not None:
+            # 資料依面積排序，面積門檻等同於「位置 >= 切點」
+            idx = idx[idx >= self.cut_index(min_area_value)]
+        return idx
+
+_panels_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def _build_panels(mtime):
+    # mtime 只作為快取鍵：GeoJSON 更新後下一次載入才會重新讀取 (load_solar_data 同樣以它為鍵)
+    return PanelArrays.from_gdf(get_initial_data())
+
+def load_panels():
+    """載入並轉成依面積排序的欄式陣列；GeoJSON 未更新前整個 process 只做一次，所有 session 共用"""
+    mtime = GEOJSON_PATH.stat().st_mtime if GEOJSON_EXISTS else None
+    # lru_cache 在同時呼叫時會各自計算一次，以鎖確保預載與頁面只解析一次
+    with _panels_lock:
+        return _build_panels(mtime)
+
+def calculate_filtered_data(solar_data, min_area_value):
+    """計算篩選後的光電板 (面積 >= 門檻的排序後綴)"""
+    return solar_data[solar_data.cut_index(min_area_value):]
+
+def to_geojson_bytes(data):
+    """將 PanelArrays 序列化為 UTF-8 GeoJSON (下載用，保留原始幾何精度)"""
+    features = [
+        {"type": "Feature", "properties": p, "geometry": None if g is None else orjson.Fragment(g)}
+        for g, p in zip(shapely.to_geojson(data.geometry), data.properties.tolist())
+    ]
+    # orjson 直接輸出 bytes，FileDownload 收到 bytes 時不再轉碼，省下 decode / encode 兩次複製
+    return orjson.dumps({"type": "FeatureCollection", "features": features})
+
+def to_features(data):
+    """取出 PanelArrays 預先簡化並轉好的 GeoJSON Feature dict 串列 (供地圖 source 使用)"""
+    return data.features.tolist()
+
+@functools.lru_cache(maxsize=64)
+def filtered_geojson_bytes(solar_data, min_area_value):
+    """依門檻快取篩選後的 GeoJSON；來回拖動滑桿時重複的門檻不必再序列化"""
+    return to_geojson_bytes(calculate_filtered_data(solar_data, min_area_value))
+
+# --- 2. MapLibre GL 地圖元件 ---
+
+LAYER_NAME = "Solar Panels"
+SOURCE_ID = "solar_panels"
+LAYER_PAINT = {
+    "fill-color": "#FFD700",
+    "fill-opacity": 0.6,
+    "fill-outline-color": "#FF4500",
+}
+EMPTY_GEOJSON = {"type": "FeatureCollection", "features": []}
+CHUNK_SIZE = 500  # 每批上傳的圖徵數量
+VIEWPORT_PADDING = 0.5  # 上傳範圍向外多取半個視窗；視角仍在已上傳範圍內時不重送
+
+def area_filter(min_area_value):
+    """MapLibre 圖層篩選運算式：只顯示面積大於門檻的光電板"""
+    # 與 cut_index 相同以 float32 門檻比較，瀏覽器端與伺服器端的篩選筆數才會一致
+    return [">=", ["get", "area_m2"], float(np.float32(min_area_value))]
+
+def create_map_instance():
+    # 1. 初始化地圖：直接使用 maplibre 的 ipywidget，不經 leafmap 的包裝
+    #    (leafmap.maplibregl 匯入時會連帶載入數百個用不到的模組)
+    m = MapWidget(
+        MapOptions(center=(120.9, 23.7), zoom=7, style=MAP_STYLE),
+        height="600px",
     )
+    # 與 leafmap 相同：前端尚未渲染前的呼叫存進 calls trait，地圖載入時才會全部重播
+    m.use_message_queue(False)
+    m.add_control(NavigationControl())
+    m.add_control(FullscreenControl())
+    m.add_control(ScaleControl(unit="metric"), position="bottom-left")
 
-    # 3. 加入篩選後的光電板圖層
-    if current_filtered_data is not None and not current_filtered_data.empty:
-        style_function = lambda x: {
-            'fillColor': '#FFD700', 
-            'color': '#FF4500',     
-            'weight': 2,
-            'fillOpacity': 0.6
-        }
-        
-        try:
-            m.add_gdf(
-                gdf=current_filtered_data,
-                layer_name="Filtered Solar Panels",
-                style_function=style_function,
-                zoom_to_layer=True 
-            )
-        except Exception as e:
-            print(f"Error adding GDF: {e}")
-    
-    # 4. FIX: 權限修復
-    # 不直接呼叫 m.to_html()，因為它會嘗試寫入唯讀目錄。
-    # 我們改為寫入 /tmp/ 目錄，然後讀取內容。
-    try:
-        # 建立一個位於 /tmp 的暫存檔案路徑
-        with tempfile.NamedTemporaryFile(suffix=".html", delete=False) as tmp:
-            temp_filepath = tmp.name
-        
-        # 將地圖存入暫存檔
-        m.to_html(outfile=temp_filepath)
-        
-        # 讀取 HTML 內容
-        with open(temp_filepath, "r", encoding="utf-8") as f:
-            map_html = f.read()
-            
-        # 刪除暫存檔 (可選，保持整潔)
-        os.remove(temp_filepath)
-
-        # 5. 使用 iframe 顯示
-        solara.HTML(
-            tag="iframe",
-            attributes={
-                "srcdoc": map_html,
-                "style": "width: 100%; height: 610px; border: none; border-radius: 8px;"
-            }
+    # 2. 建立固定 ID 的 GeoJSON source 與圖層；之後資料只透過 set_data 更新，
+    #    不必 remove_layer / add_geojson 重建圖層 (視角與互動狀態也得以保留)
+    m.add_source(SOURCE_ID, GeoJSONSource(data=EMPTY_GEOJSON))
+    m.add_layer(
+        Layer(
+            id=LAYER_NAME,
+            type=LayerType.FILL,
+            source=SOURCE_ID,
+            paint=LAYER_PAINT,
         )
-        
-    except Exception as e:
-        solara.Error(f"Map rendering failed: {e}")
+    )
+    # 滑鼠移到光電板上時顯示面積 (完整屬性請見下載的 GeoJSON)
+    m.add_tooltip(LAYER_NAME, template="面積：{{ area_label }}")
+    return m
+
+def view_bbox(view_state):
+    """由 MapLibre 回傳的 view_state 取出目前視窗 (minx, miny, maxx, maxy)"""
+    bounds = (view_state or {}).get("bounds")
+    if not bounds:
+        return None  # 前端尚未回報視角
+    sw, ne = bounds["_sw"], bounds["_ne"]
+    return (sw["lng"], sw["lat"], ne["lng"], ne["lat"])
+
+def pad_bbox(bbox):
+    """依 VIEWPORT_PADDING 向四周外擴"""
+    minx, miny, maxx, maxy = bbox
+    pad_x = (maxx - minx) * VIEWPORT_PADDING
+    pad_y = (maxy - miny) * VIEWPORT_PADDING
+    return (minx - pad_x, miny - pad_y, maxx + pad_x, maxy + pad_y)
+
+def bbox_contains(outer, inner):
+    return (outer[0] <= inner[0] and outer[1] <= inner[1]
+            and inner[2] <= outer[2] and inner[3] <= outer[3])
+
+@solara.component
+def GeoAI_MapView(solar_data, min_area_value):
+    # 每次掛載建立新的地圖：MapLibre 前端每個 view 都會重建 maplibregl.Map，
+    # 只重播首次渲染前記錄的 calls，沿用舊 widget 會讓新 view 停在過時的資料與篩選
+    m = solara.use_memo(create_map_instance, dependencies=[])
+    # bbox 為已上傳的 (外擴) 範圍；None 表示前端尚未回報視角，先上傳全部
+    bbox, set_bbox = solara.use_state(None)
+    uploaded_bbox = solara.use_ref(None)
+    streamed = solara.use_ref(False)  # 首次分批上傳是否已完成
+    rendered, set_rendered = solara.use_state(m._rendered)
+    chunks_done, set_chunks_done = solara.use_state(0)
+
+    def watch_rendered():
+        # 前端地圖載入完成前，每次呼叫都會累加進會同步的 calls trait (並在每個 view 重播)；
+        # 幾何資料等地圖載入後才以訊息送出，不留在 calls 裡
+        def on_rendered(change):
+            set_rendered(change["new"])
+        m.observe(on_rendered, names="_rendered")
+        return lambda: m.unobserve(on_rendered, names="_rendered")
+
+    def watch_viewport():
+        # 平移或縮放結束 (moveend / zoomend) 時前端會回寫 view_state；
+        # 只有視窗超出已上傳的範圍時才重新查詢並上傳，範圍內的平移與放大不重送
+        def on_view_state(change):
+            view = view_bbox(change["new"])
+            if view is None:
+                return
+            if uploaded_bbox.current is not None and bbox_contains(uploaded_bbox.current, view):
+                return
+            uploaded_bbox.current = pad_bbox(view)
+            set_bbox(uploaded_bbox.current)
+        m.observe(on_view_state, names="view_state")
+        return lambda: m.unobserve(on_view_state, names="view_state")
+
+    # 以 STRtree 只取出與目前視窗相交的光電板 (O(log N))；前端尚未回報視角時送出全部
+    visible_data = solara.use_memo(
+        lambda: solar_data if bbox is None else solar_data[solar_data.filter_viewport(bbox)],
+        dependencies=[solar_data, bbox],
+    )
+    total_chunks = -(-len(visible_data) // CHUNK_SIZE)
+
+    async def stream_data():
+        # 只上傳視窗內的光電板，由 MapLibre 在瀏覽器端切成向量瓦片 (geojson-vt)；
+        # 面積篩選仍在前端以圖層篩選條件處理；滑桿只有在自動縮放把視窗移出已上傳範圍時才會重送。
+        if not rendered:
+            return
+        if streamed.current:
+            # 視窗移出已上傳範圍後的補送一次整批取代：若再分批累加，畫面上的圖徵會先被
+            # 第一批蓋掉再逐批補回 (閃爍)，重送量也會變成 N²/CHUNK_SIZE
+            m.set_data(SOURCE_ID, {"type": "FeatureCollection", "features": to_features(visible_data)})
+            set_chunks_done(total_chunks)
+            return
+        # 首次上傳資料量大時分批送出，第一批先畫出來，其餘批次陸續補上
+        features = []
+        set_chunks_done(0)
+        if visible_data.empty:
+            m.set_data(SOURCE_ID, EMPTY_GEOJSON)  # 視窗內沒有光電板時清空先前的圖徵
+        for i, start in enumerate(range(0, len(visible_data), CHUNK_SIZE)):
+            chunk = visible_data[start:start + CHUNK_SIZE]
+            features = features + to_features(chunk)
+            m.set_data(SOURCE_ID, {"type": "FeatureCollection", "features": features})
+            set_chunks_done(i + 1)
+            await asyncio.sleep(0)  # 讓出事件迴圈，UI 保持可互動
+        streamed.current = True  # 中途被取消 (視窗又改變) 時下一次仍分批上傳
+
+    def update_filter():
+        m.set_filter(LAYER_NAME, area_filter(min_area_value))
+        # 自動縮放至篩選後的圖資範圍
+        bounds = solar_data.filtered_bounds(min_area_value)
+        if bounds is not None:
+            minx, miny, maxx, maxy = bounds
+            m.fit_bounds([[minx, miny], [maxx, maxy]])
+
+    solara.use_effect(lambda: m.close, dependencies=[m])  # 卸載時關閉 widget，釋放 comm
+    solara.use_effect(watch_rendered, dependencies=[m])
+    solara.use_effect(watch_viewport, dependencies=[m])
+    solara.lab.use_task(stream_data, dependencies=[visible_data, rendered])
+    solara.use_effect(update_filter, dependencies=[min_area_value])
+
+    if chunks_done < total_chunks:
+        solara.ProgressLinear(chunks_done / total_chunks * 100)
+    solara.Row(children=[m])
 
 
 # --- 3. 頁面佈局 ---
 
+def use_debounce(value, delay=0.15):
+    """回傳延遲 delay 秒才跟上 value 的值；拖動滑桿時略過中間值，只處理最後停下的值"""
+    debounced, set_debounced = solara.use_state(value)
+
+    async def settle():
+        await asyncio.sleep(delay)
+        set_debounced(value)
+
+    # value 改變時，尚未完成的前一個 task 會被取消
+    solara.lab.use_task(settle, dependencies=[value])
+    return debounced
+
 @solara.component
-def Page():
-    min_area_value, set_min_area = solara.use_state(10.0)
+def SolarPanelFilter(solar_data):
+    # 滑桿即時顯示原始值，篩選與地圖更新只跟隨去抖動後的值
+    slider_value, set_slider_value = solara.use_state(10.0)
+    min_area_value = use_debounce(slider_value)
     
-    current_filtered_data = calculate_filtered_data(min_area_value)
+    current_filtered_data = solara.use_memo(
+        lambda: calculate_filtered_data(solar_data, min_area_value),
+        dependencies=[solar_data, min_area_value],
+    )
     
-    total_count = len(all_solar_data.value) if all_solar_data.value is not None else 0
-    filtered_count = len(current_filtered_data) if current_filtered_data is not None else 0
+    total_count = len(solar_data)
+    filtered_count = len(current_filtered_data)
+    # 滑桿標籤的筆數直接跟隨原始值 (只是一次二分搜尋)，拖動時立即回饋；
+    # 地圖、說明文字與下載則等去抖動後的值
+    preview_count = total_count - solar_data.cut_index(slider_value)
     
-    max_area = 500.0
-    if total_count > 0 and 'area_m2' in all_solar_data.value.columns:
-         max_area = float(all_solar_data.value['area_m2'].max()) * 1.1
+    max_area = solar_data.max_area * 1.1 if total_count > 0 else 500.0
 
-    def get_data_string():
-        if current_filtered_data is not None:
-            return current_filtered_data.to_json()
-        return "{}"
+    solara.SliderFloat(
+        label=f"最小光電板面積 ({preview_count}/{total_count} 個顯示中)", 
+        value=slider_value,
+        on_value=set_slider_value,
+        min=0.0, 
+        max=max_area,
+        step=10.0,
+        thumb_label="always",
+    )
+    
+    solara.Info(f"總共偵測到 **{total_count}** 個地物。目前顯示 **{filtered_count}** 個面積大於 **{min_area_value:.2f} m²** 的光電板。")
+    
+    solara.Markdown("## 🌐 GeoAI 成果視覺化：影像與向量")
+    
+    GeoAI_MapView(solar_data, min_area_value)
+    
+    solara.Markdown("**提示：** 拖動滑塊即可即時篩選並自動縮放至圖資範圍。")
+    
+    if filtered_count > 0:
+        # 地圖篩選完全在瀏覽器端完成；GeoJSON 只在按下下載時才序列化 (並依門檻快取)
+        solara.FileDownload(
+            data=lambda: filtered_geojson_bytes(solar_data, round(min_area_value, 1)), 
+            filename="filtered_solar_panels.geojson",
+            label=f"下載篩選後的 GeoJSON ({filtered_count} 筆)",
+            icon_name="mdi-download",
+        )
+    else:
+        solara.Button("無資料可下載", disabled=True, icon_name="mdi-download")
+
+@solara.component
+def Page():
+    # 資料在背景執行緒載入，頁面先行顯示，不必等 GeoJSON 解析完成
+    # raise_error=False：載入失敗時由下方顯示錯誤訊息，而不是讓元件拋出例外
+    panels_task = solara.lab.use_task(load_panels, dependencies=[], raise_error=False)
 
     with solara.Column(align="stretch", style={"padding": "20px"}):
         solara.Title("GeoAI 光電板成果服務化")
         
         solara.Markdown("# 🌞 光電板 GeoAI 成果篩選器")
         solara.Markdown("---")
-        
-        solara.SliderFloat(
-            label=f"最小光電板面積 ({filtered_count}/{total_count} 個顯示中)", 
-            value=min_area_value,
-            on_value=set_min_area,
-            min=0.0, 
-            max=max_area,
-            step=10.0,
-            thumb_label="always",
-        )
-        
-        solara.Info(f"總共偵測到 **{total_count}** 個地物。目前顯示 **{filtered_count}** 個面積大於 **{min_area_value:.2f} m²** 的光電板。")
-        
-        solara.Markdown("## 🌐 GeoAI 成果視覺化：影像與向量")
-        
-        GeoAI_MapView(current_filtered_data)
-        
-        solara.Markdown("**提示：** 拖動滑塊即可即時篩選並自動縮放至圖資範圍。")
-        
-        if filtered_count > 0:
-            solara.FileDownload(
-                data=get_data_string, 
-                filename="filtered_solar_panels.geojson",
-                label=f"下載篩選後的 GeoJSON ({filtered_count} 筆)",
-                icon_name="mdi-download",
-            )
+
+        if panels_task.finished:
+            SolarPanelFilter(panels_task.value)
+        elif panels_task.error:
+            solara.Error(f"光電板資料載入失敗：{panels_task.exception}")
         else:
-            solara.Button("無資料可下載", disabled=True, icon_name="mdi-download")
\ No newline at end of file
+            solara.SpinnerSolara()
+            solara.Markdown("光電板資料載入中...")
+
+
+if __name__ == "__main__":
+    # 建置 Docker 映像時執行，預先產生 GeoParquet 快取
+    panels = load_panels()
+    # 空值或 NaN 面積已在載入時排除，滑桿上限 (max_area) 必須是有限值，否則建置直接失敗
+    if not panels.empty and not np.isfinite(panels.max_area):
+        raise SystemExit(f"max_area is not finite: {panels.max_area}")
+    print(f"Loaded {len(panels)} solar panels, cache: {CACHE_PATH}")
+else:
+    # 由 Solara 匯入頁面時即在背景預載，解析與第一個 HTTP 連線同時進行
+    threading.Thread(target=load_panels, daemon=True).start()